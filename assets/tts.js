@@ -0,0 +1,28 @@
+// Funciones de cliente para lector_tts_dash_web.py (namespace "tts").
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tts: {
+        // marca .word[data-idx=idx] dentro de #highlight-box
+        highlight: function (idx) {
+            const box = document.getElementById("highlight-box");
+            if (box) {
+                box.querySelectorAll(".word.active")
+                   .forEach(el => el.classList.remove("active"));
+                const el = box.querySelector('.word[data-idx="' + idx + '"]');
+                if (el) { el.classList.add("active"); }
+            }
+            return window.dash_clientside.no_update;
+        },
+        // descarga el MP3 terminado (/tts_file/<job>) sin salir de la página
+        download: function (url) {
+            if (url) {
+                const a = document.createElement("a");
+                a.href = url;
+                a.download = "speech.mp3";
+                document.body.appendChild(a);
+                a.click();
+                a.remove();
+            }
+            return window.dash_clientside.no_update;
+        }
+    }
+});
@@ -4,12 +4,15 @@
 #  • Siempre carga MP3 al <audio>, incluso en modo local
 #  • Highlight tiempo-real fluido  (dcc.Interval=100 ms)
 ##############################################################################
-import os, io, re, base64, tempfile, threading, warnings
+import os, io, re, base64, bisect, hashlib, tempfile, threading, uuid, warnings
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import lru_cache
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
 import dash, dash_bootstrap_components as dbc
-from dash import dcc, html, Input, Output, State, no_update
+from dash import dcc, html, Input, Output, State, no_update, ClientsideFunction
+from flask import Response, abort, request, send_file
 
 # ── TTS libs ───────────────────────────────────────────────────────────────
 try:
@@ -21,57 +24,229 @@ from gtts import gTTS
 from gtts.tts import gTTSError
 from deep_translator import GoogleTranslator
 from langdetect import detect, LangDetectException
+from langdetect.detector_factory import init_factory
 
 VOICE_OPTIONS = {"Zira (en-US)": "zira", "David (en-US)": "david"}
 DEFAULT_RATE  = 160                       # palabras / minuto
-
-# — estados globales —
-WORDS: List[str] = []
+MAX_TR_CHARS  = 4500                      # GoogleTranslator admite ≤ 5000
+LANG_SAMPLE   = 512                       # caracteres para detectar idioma
+MAX_UPLOAD_MB = 20                        # tamaño máximo de archivo subido
+_SENT_RE      = re.compile(r"(?<=[.!?])(\s+)")   # frase + separador
+_SPLIT_LEVELS = (_SENT_RE, re.compile(r"(\n+)"), re.compile(r"(\s+)"))
+_WORD_RE      = re.compile(r"\S+")       # mismas palabras que split_words, sin "\n"
+_TR_LOCAL     = threading.local()         # traductores reutilizables por hilo
+_TR_POOL      = ThreadPoolExecutor(max_workers=8)   # bloques largos en paralelo
+TR_AHEAD      = 3                         # bloques de una traducción por delante
+TTS_CHUNK     = 200                       # caracteres por trozo de audio
+TTS_AHEAD     = 2                         # trozos encargados por delante del lector
+MAX_TTS_JOBS  = 32                        # lecturas pendientes en memoria
+_TTS_POOL     = ThreadPoolExecutor(max_workers=4)   # síntesis gTTS en paralelo
+_SYNTH_POOL   = ThreadPoolExecutor(max_workers=4)   # lecturas gTTS (piden a _TTS_POOL)
+_LOCAL_POOL   = ThreadPoolExecutor(max_workers=1)   # motor pyttsx3: uno a la vez
+
+# — estado del motor local (uno por servidor); lo de cada sesión va en dcc.Store —
+# los trabajos viven en este proceso: el Procfile fija `--workers 1`
 WORD_IDX       = -1
-READING        = False
-ENGINE_LOCK    = threading.Lock()
+WORD_STARTS: List[int] = []              # offset de cada palabra hablada en el texto
+SPOKEN_IDX: List[int] = []               # su posición en split_words (salta los "\n")
+ACTIVE_JOB: Optional[str] = None         # trabajo pyttsx3 que está sonando
+TTS_JOBS: "OrderedDict[str, dict]" = OrderedDict()   # id → {parts, done, error}
+LOCAL_JOBS: "OrderedDict[str, Future]" = OrderedDict()        # id → MP3 pyttsx3 (/audio)
+
+# langdetect carga sus perfiles en la 1.ª detección; con `gunicorn --preload`
+# se cargan aquí, en el maestro, y el worker los hereda ya listos.
+init_factory()
 
 # ── utilidades -------------------------------------------------------------
 def detect_lang(text: str) -> str:
+    return _detect(text[:LANG_SAMPLE])    # el idioma converge con unos cientos de chars
+
+@lru_cache(maxsize=64)          # clave = muestra: no retiene documentos enteros
+def _detect(sample: str) -> str:
     try:
-        return detect(text)
+        return detect(sample)
     except LangDetectException:
         return "es"
 
+def get_translator(src: str, tgt: str) -> GoogleTranslator:
+    """Una instancia por hilo y par de idiomas (translate() muta su estado)."""
+    cache = getattr(_TR_LOCAL, "cache", None)
+    if cache is None:
+        cache = _TR_LOCAL.cache = {}
+    if (src, tgt) not in cache:
+        cache[(src, tgt)] = GoogleTranslator(source=src, target=tgt)
+    return cache[(src, tgt)]
+
+def bounded_map(pool: ThreadPoolExecutor, fn: Callable, items: Iterable,
+                ahead: int) -> Iterator:
+    """Como pool.map, en orden, pero con ≤ ahead + 1 tareas en el pool a la vez.
+
+    Un documento largo no acapara los workers que comparten los demás usuarios.
+    """
+    window = deque()
+    try:
+        for item in items:
+            window.append(pool.submit(fn, item))
+            if len(window) > ahead:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+    finally:                        # consumidor cerrado o error: no seguir
+        for fut in window:
+            fut.cancel()
+
+def split_chunks(text: str, limit: int = MAX_TR_CHARS,
+                 level: int = 0) -> List[Tuple[str, str]]:
+    """Agrupa frases en bloques ≤ limit → [(bloque, separador_siguiente)].
+
+    Un bloque que aún supera `limit` se parte por líneas y luego por espacios.
+    """
+    parts = _SPLIT_LEVELS[level].split(text)    # [trozo, sep, trozo, …, trozo]
+    out, cur, pend = [], "", ""
+    for sent, sep in zip(parts[::2], parts[1::2] + [""]):
+        if not sent:                        # separador al inicio o al final
+            pend += sep
+            continue
+        if not cur:
+            cur = pend + sent
+        elif len(cur) + len(pend) + len(sent) > limit:
+            out.append((cur, pend))
+            cur = sent
+        else:
+            cur += pend + sent
+        pend = sep
+    out.append((cur, pend))
+    if level + 1 == len(_SPLIT_LEVELS):
+        return out
+    result = []
+    for block, sep in out:
+        if len(block) <= limit:
+            result.append((block, sep))
+            continue
+        sub = split_chunks(block, limit, level + 1)
+        result += sub[:-1] + [(sub[-1][0], sub[-1][1] + sep)]
+    return result
+
 @lru_cache(maxsize=256)
-def smart_translate(text: str) -> str:
-    """Traductor ES↔EN manteniendo puntuación."""
+def smart_translate(text: str) -> Tuple[str, str]:
+    """Traductor ES↔EN manteniendo puntuación → (traducción, idioma destino)."""
     text = text.strip()
     if not text:
-        return text
+        return text, detect_lang(text)
     src = detect_lang(text)
     tgt = "es" if src == "en" else "en"
     if src == tgt:
-        return text
-    return GoogleTranslator(source=src, target=tgt).translate(text)
+        return text, src
+    if len(text) <= MAX_TR_CHARS:           # una sola petición
+        return get_translator(src, tgt).translate(text), tgt
+    chunks = split_chunks(text)
+    done = bounded_map(_TR_POOL, lambda c: get_translator(src, tgt).translate(c),
+                       [c for c, _ in chunks], TR_AHEAD)
+    return "".join(t + sep for t, (_, sep) in zip(done, chunks)), tgt
+
+def text_digest(text: str) -> str:
+    """Huella del texto fuente: el Store no reenvía el documento en cada clic."""
+    data = text.encode("utf-8", "surrogatepass")    # el JSON admite surrogates sueltos
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def prepare_text(text: str, toggle: List[str], stored=None) -> Tuple[str, str]:
+    """Texto a leer/descargar según el toggle → (texto, idioma).
+
+    `stored` es el translated-store; se usa si corresponde al texto actual.
+    """
+    if "ON" in toggle:
+        if stored and stored["digest"] == text_digest(text):
+            return stored["text"], stored["lang"]
+        return smart_translate(text)
+    return text, detect_lang(text)
 
 def text_to_mp3_bytes(text: str, lang: str) -> bytes:
-    with io.BytesIO() as buf:
-        gTTS(text=text, lang=lang, slow=False).write_to_fp(buf)
-        return buf.getvalue()
-
-def spanified(words: List[str], idx: int) -> str:
-    return " ".join(
-        "<br>"          if w == "\n"
-        else f"<mark>{w}</mark>" if i == idx
-        else w
-        for i, w in enumerate(words)
-    )
+    """MP3 de gTTS en memoria."""
+    try:
+        with io.BytesIO() as buf:
+            gTTS(text=text, lang=lang, slow=False).write_to_fp(buf)
+            return buf.getvalue()
+    except (AssertionError, ValueError) as err:   # texto vacío / idioma no soportado
+        raise gTTSError(str(err)) from err
+
+@lru_cache(maxsize=256)         # trozos ≤ TTS_CHUNK chars → unos pocos MB en total
+def chunk_mp3(chunk: str, lang: str) -> bytes:
+    """MP3 de un trozo de tts_chunks; releer o descargar no vuelve a Google."""
+    return text_to_mp3_bytes(chunk, lang)
+
+def tts_chunks(text: str, lang: str) -> Iterator[bytes]:
+    """MP3 por trozos de frases, entregados en orden (TTS_AHEAD por delante)."""
+    chunks = [c for c, _ in split_chunks(text, TTS_CHUNK)
+              if any(ch.isalnum() for ch in c)]    # vacíos/solo signos: nada que leer
+    return bounded_map(_TTS_POOL, lambda c: chunk_mp3(c, lang), chunks, TTS_AHEAD)
+
+def new_job(jobs: OrderedDict, value, job: Optional[str] = None) -> str:
+    """Guarda `value` con un id (nuevo si no se da) y descarta los más antiguos."""
+    job = job or uuid.uuid4().hex
+    jobs[job] = value
+    while len(jobs) > MAX_TTS_JOBS:
+        jobs.popitem(last=False)
+    return job
+
+def synth_job(entry: dict, text: str, lang: str):
+    """Llena entry["parts"] trozo a trozo, lo lea alguien o no."""
+    try:
+        for mp3 in tts_chunks(text, lang):
+            entry["parts"].append(mp3)
+    except Exception as err:        # el audio se corta; el tick avisa en el estado
+        entry["error"] = str(err)
+    finally:
+        entry["done"].set()
+
+def start_tts_job(text: str, lang: str) -> str:
+    """Encarga la síntesis gTTS a _SYNTH_POOL y devuelve el id para /tts_stream."""
+    entry = {"parts": [], "done": threading.Event(), "error": None}
+    _SYNTH_POOL.submit(synth_job, entry, text, lang)
+    return new_job(TTS_JOBS, entry)
+
+def split_words(text: str) -> List[str]:
+    """Palabras + "\n" por cada salto de línea (str.split, sin regex)."""
+    return [t for line in text.split("\n") for t in (*line.split(), "\n")][:-1]
+
+def spanified(words: List[str]) -> list:
+    """Hijos del highlight-box; se envían una vez y el navegador resalta."""
+    children = []
+    for i, w in enumerate(words):
+        if w == "\n":
+            children.append(html.Br())
+        else:
+            children += [html.Span(w, className="word", **{"data-idx": i}), " "]
+    return children
+
+def on_word(name, location, length):
+    """started-word de pyttsx3 → WORD_IDX = palabra que contiene `location`.
+
+    Se busca por offset y no se cuentan eventos: el motor no anuncia "—" o
+    "..." sueltos, y un salto no desplaza el resto del resaltado.
+    """
+    global WORD_IDX
+    pos = bisect.bisect_right(WORD_STARTS, location) - 1
+    if pos >= 0:
+        WORD_IDX = SPOKEN_IDX[pos]
+
+@lru_cache(maxsize=1)
+def local_engine():
+    """Motor pyttsx3 único + mapa voz→id; se crea en el primer uso local."""
+    engine = pyttsx3.init()
+    engine.connect("started-word", on_word)     # una sola vez por motor
+    voices = engine.getProperty("voices")
+    voice_ids = {key: next((v.id for v in voices if key in v.name.lower()), None)
+                 for key in VOICE_OPTIONS.values()}
+    return engine, voice_ids
 
 def speak_and_record(text: str, voice_key: str, rate: int, tmp_path: str):
     """pyttsx3 → graba a WAV y reproduce; luego convertimos a MP3."""
     import wave
     import pyaudio
-    engine = pyttsx3.init()
-    for v in engine.getProperty("voices"):
-        if voice_key.lower() in v.name.lower():
-            engine.setProperty("voice", v.id)
-            break
+    engine, voice_ids = local_engine()
+    voice_id = voice_ids.get(voice_key.lower())
+    if voice_id:
+        engine.setProperty("voice", voice_id)
     engine.setProperty("rate", rate)
 
     # grabar a wav
@@ -86,7 +261,7 @@ def pyttsx3_to_mp3(text: str, voice: str, rate: int) -> bytes:
         speak_and_record(text, voice, rate, wav_path)
         # -> convertir a MP3 en RAM con gTTS wrapper
         # usamos gTTS porque su encoder es sencillo y evita instalar ffmpeg
-        return text_to_mp3_bytes(text, "en")
+        return b"".join(tts_chunks(text, "en"))
     finally:
         try:
             os.remove(wav_path)
@@ -94,11 +269,12 @@ def pyttsx3_to_mp3(text: str, voice: str, rate: int) -> bytes:
             pass
 
 def extract_text(content: str, filename: str) -> str:
+    if not filename.lower().endswith(".txt"):
+        raise ValueError("Solo se soportan archivos .txt en esta versión.")
     header, b64data = content.split(",", 1)
-    raw = base64.b64decode(b64data)
-    if filename.lower().endswith(".txt"):
-        return raw.decode("utf-8", errors="ignore")
-    raise ValueError("Solo se soportan archivos .txt en esta versión.")
+    if len(b64data) * 3 // 4 > MAX_UPLOAD_MB * 2**20:    # antes de decodificar
+        raise ValueError(f"Archivo > {MAX_UPLOAD_MB} MB")
+    return base64.b64decode(b64data).decode("utf-8", errors="ignore")
 
 # ── Dash UI ----------------------------------------------------------------
 external_css = [
@@ -108,12 +284,56 @@ external_css = [
 app = dash.Dash(__name__, external_stylesheets=external_css, title="TTS Translator")
 server = app.server
 
+@server.route("/tts_stream/<job>")
+def tts_stream(job):
+    """MP3 de gTTS: retransmite los trozos ya generados; al terminar, con Range."""
+    entry = TTS_JOBS.get(job)       # puede haber salido del OrderedDict acotado
+    if entry is None:
+        abort(404)
+    rng = request.range
+    if rng is not None and rng.ranges != [(0, None)]:   # Safari/iOS: rango concreto
+        entry["done"].wait()
+    if entry["done"].is_set():
+        return send_file(io.BytesIO(b"".join(entry["parts"])), mimetype="audio/mpeg",
+                         conditional=True)
+
+    def relay():                    # solo copia; la síntesis sigue en _SYNTH_POOL
+        sent, parts = 0, entry["parts"]
+        while True:
+            finished = entry["done"].wait(0.1)
+            while sent < len(parts):
+                yield parts[sent]
+                sent += 1
+            if finished:
+                return
+    return Response(relay(), mimetype="audio/mpeg")
+
+@server.route("/tts_file/<job>")
+def tts_file(job):
+    """MP3 gTTS terminado como descarga; el tick da la URL cuando está listo."""
+    entry = TTS_JOBS.get(job)
+    if entry is None or not entry["done"].is_set() or not entry["parts"]:
+        abort(404)
+    return send_file(io.BytesIO(b"".join(entry["parts"])), mimetype="audio/mpeg",
+                     as_attachment=True, download_name="speech.mp3")
+
+@server.route("/audio/<job>")
+def local_audio(job):
+    """MP3 ya generado por pyttsx3; sin base64 y con soporte de Range."""
+    fut = LOCAL_JOBS.get(job)
+    if fut is None or not fut.done() or fut.exception() is not None:
+        abort(404)
+    return send_file(io.BytesIO(fut.result()), mimetype="audio/mpeg",
+                     conditional=True)
+
 controls = dbc.Card(
     dbc.CardBody([
         dbc.Textarea(id="text-input", placeholder="Escribe o sube un documento…",
+                     debounce=True,       # traduce al salir del campo, no por tecla
                      style={"width": "100%", "height": 200, "fontSize": 20}),
-        dcc.Upload(id="upload-doc", multiple=False,
-                   children=html.Div("📄 Arrastra o haz clic para subir archivo (.txt)"),
+        dcc.Upload(id="upload-doc", multiple=False, max_size=MAX_UPLOAD_MB * 2**20,
+                   children=html.Div(f"📄 Arrastra o haz clic para subir archivo "
+                                     f"(.txt, máx. {MAX_UPLOAD_MB} MB)"),
                    style={"width": "100%", "height": 60, "lineHeight": "60px",
                           "borderWidth": 1, "borderStyle": "dashed", "borderRadius": 5,
                           "textAlign": "center", "marginTop": 10}),
@@ -166,7 +386,14 @@ app.layout = dbc.Container([
     ], className="g-4"),
     html.Div(id="status", className="mt-3 text-muted"),
     dcc.Interval(id="tick", interval=100, n_intervals=0, disabled=True),  # 100 ms
-    dcc.Download(id="download-audio"),
+    dcc.Store(id="cur-idx", data=-1),     # palabra actual → resaltado en cliente
+    dcc.Store(id="hl-sink"),              # salida muda del callback de cliente
+    dcc.Store(id="translated-store"),     # última traducción mostrada
+    dcc.Store(id="local-job"),            # id del trabajo pyttsx3 en curso
+    dcc.Store(id="stream-job"),           # id de la lectura gTTS en /tts_stream
+    dcc.Store(id="dl-job"),               # id del MP3 gTTS que se está generando
+    dcc.Store(id="dl-url"),               # /tts_file/<id> listo → descarga en cliente
+    dcc.Store(id="dl-sink"),              # salida muda de la descarga en cliente
     dcc.Download(id="download-text")
 ], fluid=True)
 
@@ -183,99 +410,145 @@ def file_up(contents, filename):
         return f"⚠️ {e}"
 
 @app.callback(Output("translation-box", "children"),
+              Output("translated-store", "data"),
               Input("text-input", "value"), Input("translate-toggle", "value"))
 def update_tr(text, toggle):
-    return smart_translate(text) if text and "ON" in toggle else text or ""
+    if not text or "ON" not in toggle:
+        return text or "", None
+    translated, lang = smart_translate(text)
+    return translated, {"digest": text_digest(text), "text": translated, "lang": lang}
 
 @app.callback(
     Output("status", "children"),
     Output("tick", "disabled", allow_duplicate=True),
     Output("highlight-box", "children", allow_duplicate=True),
     Output("audio-player", "src"),
+    Output("cur-idx", "data", allow_duplicate=True),
+    Output("local-job", "data"),
+    Output("stream-job", "data"),
     State("text-input", "value"),
     State("voice-selector", "value"),
     State("rate-slider", "value"),
     State("translate-toggle", "value"),
     State("tts-engine", "value"),
+    State("translated-store", "data"),
     Input("speak-btn", "n_clicks"), prevent_initial_call=True)
-def speak_handler(text, voice, rate, toggle, engine_sel, _):
-    global WORDS, WORD_IDX, READING
+def speak_handler(text, voice, rate, toggle, engine_sel, stored, _):
     if not text or not text.strip():
-        return "⚠️ Escribe algo o sube un documento primero.", True, "", no_update
+        return ("⚠️ Escribe algo o sube un documento primero.", True, "", no_update,
+                -1, None, None)
 
-    to_read = smart_translate(text) if "ON" in toggle else text
-    WORDS, WORD_IDX = re.findall(r"\S+|\n", to_read), -1
+    to_read, lang = prepare_text(text, toggle, stored)
 
     # — gTTS (navegador) —
     if engine_sel == "gtts" or pyttsx3 is None:
-        try:
-            mp3 = text_to_mp3_bytes(to_read, detect_lang(to_read))
-        except gTTSError as err:
-            return f"⚠️ Google TTS limit: {err}", True, "", no_update
-        src = "data:audio/mp3;base64," + base64.b64encode(mp3).decode()
-        return "🎧 Reproduciendo en navegador (gTTS)", True, "", src
+        job = start_tts_job(to_read, lang)
+        # el tick sigue activo para avisar si gTTS falla a mitad del audio
+        return ("🎧 Reproduciendo en navegador (gTTS)", False, "", f"/tts_stream/{job}",
+                -1, None, job)
 
     # — pyttsx3 (local + mp3 al navegador) —
-    def local_job():
-        global READING
-        with ENGINE_LOCK:
-            READING = True
-            mp3_bytes = pyttsx3_to_mp3(to_read, voice, rate)
-            src_b64 = base64.b64encode(mp3_bytes).decode()
-            # enviamos el MP3 al frontend mediante un Store dummy
-            app._cached_mp3 = "data:audio/mp3;base64," + src_b64   # hack simple
-            READING = False
-
-    threading.Thread(target=local_job, daemon=True).start()
-    return "▶️ Leyendo en dispositivo (pyttsx3)…", False, spanified(WORDS, -1), no_update
+    words = split_words(to_read)
+    spoken = [i for i, w in enumerate(words) if w != "\n"]
+    starts = [m.start() for m in _WORD_RE.finditer(to_read)]
+    job = uuid.uuid4().hex
+
+    def local_job() -> bytes:
+        global WORD_IDX, WORD_STARTS, SPOKEN_IDX, ACTIVE_JOB
+        WORD_IDX, WORD_STARTS, SPOKEN_IDX, ACTIVE_JOB = -1, starts, spoken, job
+        return pyttsx3_to_mp3(to_read, voice, rate)
+
+    # el tick enlaza el MP3 de *este* trabajo (/audio/<job>) cuando termina
+    new_job(LOCAL_JOBS, _LOCAL_POOL.submit(local_job), job)
+    return ("▶️ Leyendo en dispositivo (pyttsx3)…", False, spanified(words),
+            no_update, -1, job, None)
 
 @app.callback(
-    Output("highlight-box", "children", allow_duplicate=True),
+    Output("cur-idx", "data",       allow_duplicate=True),
     Output("tick", "disabled",      allow_duplicate=True),
     Output("audio-player", "src",   allow_duplicate=True),
-    Input("tick", "n_intervals"), prevent_initial_call=True)
-def tick(_):
-    src = getattr(app, "_cached_mp3", no_update)
-    if src is not no_update:
-        app._cached_mp3 = no_update     # limpiar
-    disabled = not READING
-    return spanified(WORDS, WORD_IDX), disabled, src
+    Output("status", "children",    allow_duplicate=True),
+    Output("dl-url", "data"),
+    Output("dl-job", "data",        allow_duplicate=True),
+    Input("tick", "n_intervals"),
+    State("cur-idx", "data"),
+    State("local-job", "data"),
+    State("stream-job", "data"),
+    State("dl-job", "data"), prevent_initial_call=True)
+def tick(_, shown_idx, job, stream_job, dl_job):
+    src, status, pending = no_update, no_update, False
+    dl_url, dl_left = no_update, no_update
+    fut = LOCAL_JOBS.get(job)
+    if fut is not None:
+        pending = not fut.done()
+        if not pending and fut.exception() is None:
+            src = f"/audio/{job}"       # último tick: el <audio> lo pide aparte
+        elif not pending:
+            status = f"⚠️ Error en la lectura local: {fut.exception()}"
+    entry = TTS_JOBS.get(stream_job)
+    if entry is not None:
+        pending = pending or not entry["done"].is_set()
+        if entry["error"]:
+            status = f"⚠️ Google TTS limit: {entry['error']}"
+    dl = TTS_JOBS.get(dl_job)
+    if dl is not None:
+        if not dl["done"].is_set():
+            pending = True
+        elif dl["error"]:
+            status, dl_left = f"⚠️ Google TTS limit: {dl['error']}", None
+        else:                           # se entrega una sola vez
+            dl_left = None
+            if dl["parts"]:             # texto sin nada legible: no hay archivo
+                status, dl_url = "⬇️ MP3 listo", f"/tts_file/{dl_job}"
+    # solo se envía lo que cambió, y solo a la sesión cuyo texto suena
+    idx = WORD_IDX if job == ACTIVE_JOB and WORD_IDX != shown_idx else no_update
+    disabled = no_update if pending else True
+    return idx, disabled, src, status, dl_url, dl_left
+
+# resaltado en el navegador (assets/tts.js): solo viaja el índice, no el texto
+app.clientside_callback(
+    ClientsideFunction(namespace="tts", function_name="highlight"),
+    Output("hl-sink", "data"),
+    Input("cur-idx", "data"))
+
+app.clientside_callback(
+    ClientsideFunction(namespace="tts", function_name="download"),
+    Output("dl-sink", "data"),
+    Input("dl-url", "data"))
 
 @app.callback(
     Output("status", "children",    allow_duplicate=True),
     Output("tick", "disabled",      allow_duplicate=True),
-    Output("highlight-box", "children", allow_duplicate=True),
+    Output("cur-idx", "data",       allow_duplicate=True),
     Output("audio-player", "src",   allow_duplicate=True),
     Input("stop-btn", "n_clicks"), prevent_initial_call=True)
 def stop(_):
-    global READING, WORD_IDX
-    with ENGINE_LOCK:
-        READING, WORD_IDX = False, -1
-    return "⏹️ Detenido", True, spanified(WORDS, -1), no_update
+    return "⏹️ Detenido", True, -1, no_update
 
-@app.callback(Output("download-audio", "data"),
+@app.callback(Output("dl-job", "data"),
+              Output("tick", "disabled",      allow_duplicate=True),
+              Output("status", "children",    allow_duplicate=True),
               State("text-input", "value"),
               State("translate-toggle", "value"),
+              State("translated-store", "data"),
               Input("download-btn", "n_clicks"), prevent_initial_call=True)
-def dl_audio(text, toggle, _):
+def dl_audio(text, toggle, stored, _):
     if not text.strip():
-        return no_update
-    processed = smart_translate(text) if "ON" in toggle else text
-    try:
-        mp3 = text_to_mp3_bytes(processed, detect_lang(processed))
-    except gTTSError:
-        return no_update
-    return dcc.send_bytes(mp3, "speech.mp3")
+        return no_update, no_update, no_update
+    processed, lang = prepare_text(text, toggle, stored)
+    # se sintetiza en _SYNTH_POOL (mismos trozos que la lectura); el tick avisa
+    return start_tts_job(processed, lang), False, "⏳ Generando MP3…"
 
 @app.callback(Output("download-text", "data"),
               State("text-input", "value"),
               State("translate-toggle", "value"),
+              State("translated-store", "data"),
               Input("download-txt-btn", "n_clicks"), prevent_initial_call=True)
-def dl_txt(text, toggle, _):
+def dl_txt(text, toggle, stored, _):
     if not text.strip():
         return no_update
-    result = smart_translate(text) if "ON" in toggle else text
-    fname = "translation_en.txt" if detect_lang(result) == "en" else "traduccion_es.txt"
+    result, lang = prepare_text(text, toggle, stored)
+    fname = "translation_en.txt" if lang == "en" else "traduccion_es.txt"
     return dict(content=result, filename=fname, type="text/plain")
 
 # ── run ────────────────────────────────────────────────────────────────────